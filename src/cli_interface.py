@@ -3,11 +3,51 @@ CLI Interface - Command line interface for the time and task manager
 """
 
 import sys
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
+from operator import itemgetter
 from task_manager import TaskManager, Task
 from time_tracker import TimeTracker, TimeEntry
 
+def _prompt(label: str) -> str:
+    """Read a line of user input with surrounding whitespace removed."""
+    return input(label).strip()
+
+def _parse_hours(text: str) -> Optional[float]:
+    """Parse an hours answer; None when it is empty or not a number."""
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+# Static menu text, built once at import
+MENU_HEADER = "\n" + "="*50 + "\nTIME AND TASK MANAGER\n" + "="*50
+MAIN_MENU = "\n".join([
+    "1. Create new task",
+    "2. List all tasks",
+    "3. Update task",
+    "4. Delete task",
+    "5. Start timer",
+    "6. Stop timer",
+    "7. View time reports",
+    "8. Exit",
+])
+REPORT_MENU = "\n".join([
+    "\n--- TIME REPORTS ---",
+    "1. Report by task",
+    "2. Report by customer",
+    "3. Report by project",
+    "4. All time entries",
+])
+# Statuses a task can be given in update_task
+TASK_STATUSES = frozenset(('active', 'completed', 'paused'))
+# Tasks shown per page in the task list
+TASKS_PER_PAGE = 20
+# Task list badge per status; any other status shows as active
+STATUS_EMOJI = {"completed": "✅", "paused": "⏸️"}
+
 class CLIInterface:
     """Command line interface for the time and task manager."""
     
@@ -15,85 +55,96 @@ class CLIInterface:
         """Initialize CLI with task manager and time tracker."""
         self.task_manager = task_manager
         self.time_tracker = time_tracker
+        # Main menu choice -> handler
+        self._dispatch = {
+            '1': self.create_task,
+            '2': self.list_tasks,
+            '3': self.update_task,
+            '4': self.delete_task,
+            '5': self.start_timer,
+            '6': self.stop_timer,
+            '7': self.view_time_reports,
+            '8': self._exit,
+        }
+        # Report name -> (data revisions it was built at, report lines)
+        self._report_cache: Dict[str, Tuple[Tuple[int, int], List[str]]] = {}
     
     def run(self) -> None:
         """Run the main CLI loop."""
         while True:
             self.show_main_menu()
-            choice = input("\nEnter your choice (1-8): ").strip()
+            choice = _prompt("\nEnter your choice (1-8): ")
             
-            if choice == '1':
-                self.create_task()
-            elif choice == '2':
-                self.list_tasks()
-            elif choice == '3':
-                self.update_task()
-            elif choice == '4':
-                self.delete_task()
-            elif choice == '5':
-                self.start_timer()
-            elif choice == '6':
-                self.stop_timer()
-            elif choice == '7':
-                self.view_time_reports()
-            elif choice == '8':
-                print("Thank you for using Time and Task Manager!")
-                sys.exit(0)
-            else:
+            action = self._dispatch.get(choice)
+            if action is None:
                 print("Invalid choice. Please try again.")
+            else:
+                action()
             
             input("\nPress Enter to continue...")
     
+    def _exit(self) -> None:
+        """Say goodbye and exit the application."""
+        print("Thank you for using Time and Task Manager!")
+        sys.exit(0)
+    
+    def _cached_report(self, name: str, build: Callable[[], List[str]]) -> List[str]:
+        """Build report lines, reusing the last result while no data has changed."""
+        if self.time_tracker.get_active_entry():
+            # A running timer changes the totals by the second
+            return build()
+        cached = self._report_cache.get(name)
+        if cached and cached[0] == (self.task_manager.revision, self.time_tracker.revision):
+            return cached[1]
+        lines = build()
+        # Read the revisions after building, which may have loaded the tasks
+        self._report_cache[name] = ((self.task_manager.revision, self.time_tracker.revision), lines)
+        return lines
+    
+    def _emit(self, lines: List[str]) -> None:
+        """Write report lines to stdout in a single call."""
+        sys.stdout.write("\n".join(lines))
+        sys.stdout.write("\n")
+    
     def show_main_menu(self) -> None:
         """Display the main menu."""
-        print("\n" + "="*50)
-        print("TIME AND TASK MANAGER")
-        print("="*50)
+        print(MENU_HEADER)
         
         # Show active timer if any
         active_entry = self.time_tracker.get_active_entry()
         if active_entry:
             task = self.task_manager.get_task(active_entry.task_id)
             task_title = task.title if task else "Unknown Task"
-            start_time = datetime.fromisoformat(active_entry.start_time)
-            elapsed = datetime.now() - start_time
+            elapsed = datetime.now() - active_entry.start_dt
             hours, remainder = divmod(int(elapsed.total_seconds()), 3600)
             minutes, _ = divmod(remainder, 60)
             print(f"⏱️  TIMER ACTIVE: {task_title} ({hours}h {minutes}m)")
             print("-"*50)
         
-        print("1. Create new task")
-        print("2. List all tasks")
-        print("3. Update task")
-        print("4. Delete task")
-        print("5. Start timer")
-        print("6. Stop timer")
-        print("7. View time reports")
-        print("8. Exit")
+        print(MAIN_MENU)
     
     def create_task(self) -> None:
         """Create a new task."""
         print("\n--- CREATE NEW TASK ---")
         
-        title = input("Task title: ").strip()
+        title = _prompt("Task title: ")
         if not title:
             print("Task title is required.")
             return
         
-        description = input("Task description: ").strip()
-        customer = input("Customer name: ").strip()
+        description = _prompt("Task description: ")
+        customer = _prompt("Customer name: ")
         if not customer:
             print("Customer name is required.")
             return
         
-        project = input("Project name: ").strip()
+        project = _prompt("Project name: ")
         if not project:
             print("Project name is required.")
             return
         
-        try:
-            estimated_hours = float(input("Estimated hours (optional, default 0): ").strip() or "0")
-        except ValueError:
+        estimated_hours = _parse_hours(_prompt("Estimated hours (optional, default 0): "))
+        if estimated_hours is None:
             estimated_hours = 0.0
         
         task = self.task_manager.create_task(
@@ -114,34 +165,45 @@ class CLIInterface:
         """List all tasks."""
         print("\n--- ALL TASKS ---")
         
-        tasks = self.task_manager.get_all_tasks()
-        if not tasks:
+        task_count = self.task_manager.count_tasks()
+        if not task_count:
             print("No tasks found.")
             return
         
-        # Sort tasks by creation date (most recent first)
-        tasks.sort(key=lambda t: t.created_at, reverse=True)
-        
-        for i, task in enumerate(tasks, 1):
-            total_time = self.time_tracker.get_total_time_for_task(task.id)
-            status_emoji = "✅" if task.status == "completed" else "⏸️" if task.status == "paused" else "🔄"
+        totals = self.time_tracker.get_totals_by_task()
+        shown = 0
+        while True:
+            # Next page of tasks by creation date (most recent first)
+            tasks = self.task_manager.get_tasks_by_created(shown, TASKS_PER_PAGE)
+            out = []
+            for i, task in enumerate(tasks, shown + 1):
+                total_time = totals.get(task.id, 0.0)
+                status_emoji = STATUS_EMOJI.get(task.status, "🔄")
+                
+                out.append(f"\n{i}. {status_emoji} {task.title}")
+                out.append(f"   ID: {task.id}")
+                out.append(f"   Customer: {task.customer}")
+                out.append(f"   Project: {task.project}")
+                out.append(f"   Status: {task.status}")
+                out.append(f"   Time spent: {total_time:.2f}h")
+                if task.estimated_hours > 0:
+                    out.append(f"   Estimated: {task.estimated_hours:.2f}h")
+                if task.description:
+                    out.append(f"   Description: {task.description}")
+            self._emit(out)
             
-            print(f"\n{i}. {status_emoji} {task.title}")
-            print(f"   ID: {task.id}")
-            print(f"   Customer: {task.customer}")
-            print(f"   Project: {task.project}")
-            print(f"   Status: {task.status}")
-            print(f"   Time spent: {total_time:.2f}h")
-            if task.estimated_hours > 0:
-                print(f"   Estimated: {task.estimated_hours:.2f}h")
-            if task.description:
-                print(f"   Description: {task.description}")
+            shown += len(tasks)
+            if shown >= task_count:
+                break
+            more = _prompt(f"\nShowing {shown} of {task_count} tasks. Press Enter for more, or q to stop: ")
+            if more.lower() == 'q':
+                break
     
     def update_task(self) -> None:
         """Update an existing task."""
         print("\n--- UPDATE TASK ---")
         
-        task_id = input("Enter task ID to update: ").strip()
+        task_id = _prompt("Enter task ID to update: ")
         task = self.task_manager.get_task(task_id)
         
         if not task:
@@ -151,17 +213,13 @@ class CLIInterface:
         print(f"\nCurrent task: {task.title}")
         print("Leave fields empty to keep current values.")
         
-        title = input(f"Title ({task.title}): ").strip()
-        description = input(f"Description ({task.description}): ").strip()
-        customer = input(f"Customer ({task.customer}): ").strip()
-        project = input(f"Project ({task.project}): ").strip()
-        status = input(f"Status ({task.status}) [active/completed/paused]: ").strip()
+        title = _prompt(f"Title ({task.title}): ")
+        description = _prompt(f"Description ({task.description}): ")
+        customer = _prompt(f"Customer ({task.customer}): ")
+        project = _prompt(f"Project ({task.project}): ")
+        status = _prompt(f"Status ({task.status}) [active/completed/paused]: ")
         
-        try:
-            est_hours_input = input(f"Estimated hours ({task.estimated_hours}): ").strip()
-            estimated_hours = float(est_hours_input) if est_hours_input else None
-        except ValueError:
-            estimated_hours = None
+        estimated_hours = _parse_hours(_prompt(f"Estimated hours ({task.estimated_hours}): "))
         
         # Build update dictionary
         updates = {}
@@ -169,11 +227,14 @@ class CLIInterface:
         if description: updates['description'] = description
         if customer: updates['customer'] = customer
         if project: updates['project'] = project
-        if status and status in ['active', 'completed', 'paused']: updates['status'] = status
+        if status in TASK_STATUSES: updates['status'] = status
         if estimated_hours is not None: updates['estimated_hours'] = estimated_hours
         
-        if updates:
-            updated_task = self.task_manager.update_task(task_id, **updates)
+        # update_task skips values that match the task; the revision moves only on a real change
+        revision = self.task_manager.revision
+        updated_task = self.task_manager.update_task(task_id, **updates)
+        
+        if self.task_manager.revision != revision:
             print(f"\n✅ Task updated successfully!")
             print(f"Title: {updated_task.title}")
         else:
@@ -183,7 +244,7 @@ class CLIInterface:
         """Delete a task."""
         print("\n--- DELETE TASK ---")
         
-        task_id = input("Enter task ID to delete: ").strip()
+        task_id = _prompt("Enter task ID to delete: ")
         task = self.task_manager.get_task(task_id)
         
         if not task:
@@ -194,7 +255,7 @@ class CLIInterface:
         print(f"Customer: {task.customer}")
         print(f"Project: {task.project}")
         
-        confirm = input("\nAre you sure you want to delete this task? (y/N): ").strip().lower()
+        confirm = _prompt("\nAre you sure you want to delete this task? (y/N): ").lower()
         
         if confirm == 'y':
             if self.task_manager.delete_task(task_id):
@@ -214,18 +275,17 @@ class CLIInterface:
             task = self.task_manager.get_task(active_entry.task_id)
             task_title = task.title if task else "Unknown Task"
             print(f"Timer already active for: {task_title}")
-            stop_current = input("Stop current timer and start new one? (y/N): ").strip().lower()
+            stop_current = _prompt("Stop current timer and start new one? (y/N): ").lower()
             if stop_current != 'y':
                 return
         
         # List tasks to choose from
-        tasks = self.task_manager.get_all_tasks()
-        if not tasks:
+        if not self.task_manager.get_all_tasks():
             print("No tasks available. Please create a task first.")
             return
         
         print("\nAvailable tasks:")
-        active_tasks = [task for task in tasks if task.status == 'active']
+        active_tasks = self.task_manager.get_tasks_by_status('active')
         
         if not active_tasks:
             print("No active tasks available.")
@@ -235,14 +295,14 @@ class CLIInterface:
             print(f"{i}. {task.title} - {task.customer}/{task.project}")
         
         try:
-            choice = int(input("\nSelect task number: ").strip())
+            choice = int(_prompt("\nSelect task number: "))
             if 1 <= choice <= len(active_tasks):
                 selected_task = active_tasks[choice - 1]
-                description = input("Work description (optional): ").strip()
+                description = _prompt("Work description (optional): ")
                 
                 entry = self.time_tracker.start_timer(selected_task.id, description)
                 print(f"\n✅ Timer started for: {selected_task.title}")
-                print(f"Start time: {datetime.fromisoformat(entry.start_time).strftime('%H:%M:%S')}")
+                print(f"Start time: {entry.start_dt.strftime('%H:%M:%S')}")
             else:
                 print("Invalid selection.")
         except ValueError:
@@ -267,20 +327,16 @@ class CLIInterface:
             duration_hours = completed_entry.get_duration_hours()
             print(f"\n✅ Timer stopped!")
             print(f"Duration: {duration_hours:.2f} hours")
-            print(f"Start: {datetime.fromisoformat(completed_entry.start_time).strftime('%H:%M:%S')}")
-            print(f"End: {datetime.fromisoformat(completed_entry.end_time).strftime('%H:%M:%S')}")
+            print(f"Start: {completed_entry.start_dt.strftime('%H:%M:%S')}")
+            print(f"End: {completed_entry.end_dt.strftime('%H:%M:%S')}")
         else:
             print("❌ Failed to stop timer.")
     
     def view_time_reports(self) -> None:
         """View time reports."""
-        print("\n--- TIME REPORTS ---")
-        print("1. Report by task")
-        print("2. Report by customer")
-        print("3. Report by project")
-        print("4. All time entries")
+        print(REPORT_MENU)
         
-        choice = input("\nSelect report type (1-4): ").strip()
+        choice = _prompt("\nSelect report type (1-4): ")
         
         if choice == '1':
             self.report_by_task()
@@ -296,131 +352,143 @@ class CLIInterface:
     def report_by_task(self) -> None:
         """Generate report by task."""
         print("\n--- TIME REPORT BY TASK ---")
-        
+        self._emit(self._cached_report('report_by_task', self._report_by_task_lines))
+    
+    def _report_by_task_lines(self) -> List[str]:
+        """Build the lines of the by-task report."""
         tasks = self.task_manager.get_all_tasks()
         if not tasks:
-            print("No tasks found.")
-            return
+            return ["No tasks found."]
         
         tasks_with_time = []
+        total_all_time = 0.0
+        totals = self.time_tracker.get_totals_by_task()
         for task in tasks:
-            total_time = self.time_tracker.get_total_time_for_task(task.id)
+            total_time = totals.get(task.id, 0.0)
             if total_time > 0:
                 tasks_with_time.append((task, total_time))
+                total_all_time += total_time
         
         if not tasks_with_time:
-            print("No time entries found.")
-            return
+            return ["No time entries found."]
         
         # Sort by time spent (descending)
-        tasks_with_time.sort(key=lambda x: x[1], reverse=True)
-        
-        total_all_time = sum(time for _, time in tasks_with_time)
+        tasks_with_time.sort(key=itemgetter(1), reverse=True)
         
+        out = []
         for task, total_time in tasks_with_time:
-            print(f"\n📋 {task.title}")
-            print(f"   Customer: {task.customer}")
-            print(f"   Project: {task.project}")
-            print(f"   Time spent: {total_time:.2f}h")
+            out.append(f"\n📋 {task.title}")
+            out.append(f"   Customer: {task.customer}")
+            out.append(f"   Project: {task.project}")
+            out.append(f"   Time spent: {total_time:.2f}h")
             if task.estimated_hours > 0:
                 percentage = (total_time / task.estimated_hours) * 100
-                print(f"   Estimated: {task.estimated_hours:.2f}h ({percentage:.1f}%)")
+                out.append(f"   Estimated: {task.estimated_hours:.2f}h ({percentage:.1f}%)")
         
-        print(f"\n📊 TOTAL TIME: {total_all_time:.2f} hours")
+        out.append(f"\n📊 TOTAL TIME: {total_all_time:.2f} hours")
+        return out
     
     def report_by_customer(self) -> None:
         """Generate report by customer."""
         print("\n--- TIME REPORT BY CUSTOMER ---")
-        
-        customers = self.task_manager.get_customers()
-        if not customers:
-            print("No customers found.")
-            return
+        self._emit(self._cached_report('report_by_customer', self._report_by_customer_lines))
+    
+    def _report_by_customer_lines(self) -> List[str]:
+        """Build the lines of the by-customer report."""
+        by_customer, _ = self.task_manager.grouped_views()
+        if not by_customer:
+            return ["No customers found."]
         
         customer_times = {}
-        for customer in customers:
-            tasks = self.task_manager.get_tasks_by_customer(customer)
-            total_time = sum(self.time_tracker.get_total_time_for_task(task.id) for task in tasks)
+        total_all_time = 0.0
+        totals = self.time_tracker.get_totals_by_task()
+        for customer, tasks in by_customer.items():
+            total_time = sum(totals.get(task_id, 0.0) for task_id in tasks)
             if total_time > 0:
                 customer_times[customer] = total_time
+                total_all_time += total_time
         
         if not customer_times:
-            print("No time entries found.")
-            return
+            return ["No time entries found."]
         
         # Sort by time spent (descending)
-        sorted_customers = sorted(customer_times.items(), key=lambda x: x[1], reverse=True)
-        
-        total_all_time = sum(customer_times.values())
+        sorted_customers = sorted(customer_times.items(), key=itemgetter(1), reverse=True)
         
+        out = []
         for customer, total_time in sorted_customers:
-            print(f"\n👤 {customer}")
-            print(f"   Total time: {total_time:.2f}h")
+            out.append(f"\n👤 {customer}")
+            out.append(f"   Total time: {total_time:.2f}h")
             percentage = (total_time / total_all_time) * 100
-            print(f"   Percentage: {percentage:.1f}%")
+            out.append(f"   Percentage: {percentage:.1f}%")
         
-        print(f"\n📊 TOTAL TIME: {total_all_time:.2f} hours")
+        out.append(f"\n📊 TOTAL TIME: {total_all_time:.2f} hours")
+        return out
     
     def report_by_project(self) -> None:
         """Generate report by project."""
         print("\n--- TIME REPORT BY PROJECT ---")
-        
-        projects = self.task_manager.get_projects()
-        if not projects:
-            print("No projects found.")
-            return
+        self._emit(self._cached_report('report_by_project', self._report_by_project_lines))
+    
+    def _report_by_project_lines(self) -> List[str]:
+        """Build the lines of the by-project report."""
+        _, by_project = self.task_manager.grouped_views()
+        if not by_project:
+            return ["No projects found."]
         
         project_times = {}
-        for project in projects:
-            tasks = self.task_manager.get_tasks_by_project(project)
-            total_time = sum(self.time_tracker.get_total_time_for_task(task.id) for task in tasks)
+        total_all_time = 0.0
+        totals = self.time_tracker.get_totals_by_task()
+        for project, tasks in by_project.items():
+            total_time = sum(totals.get(task_id, 0.0) for task_id in tasks)
             if total_time > 0:
                 project_times[project] = total_time
+                total_all_time += total_time
         
         if not project_times:
-            print("No time entries found.")
-            return
+            return ["No time entries found."]
         
         # Sort by time spent (descending)
-        sorted_projects = sorted(project_times.items(), key=lambda x: x[1], reverse=True)
-        
-        total_all_time = sum(project_times.values())
+        sorted_projects = sorted(project_times.items(), key=itemgetter(1), reverse=True)
         
+        out = []
         for project, total_time in sorted_projects:
-            print(f"\n📁 {project}")
-            print(f"   Total time: {total_time:.2f}h")
+            out.append(f"\n📁 {project}")
+            out.append(f"   Total time: {total_time:.2f}h")
             percentage = (total_time / total_all_time) * 100
-            print(f"   Percentage: {percentage:.1f}%")
+            out.append(f"   Percentage: {percentage:.1f}%")
         
-        print(f"\n📊 TOTAL TIME: {total_all_time:.2f} hours")
+        out.append(f"\n📊 TOTAL TIME: {total_all_time:.2f} hours")
+        return out
     
     def report_all_entries(self) -> None:
         """Show all time entries."""
         print("\n--- ALL TIME ENTRIES ---")
-        
-        entries = self.time_tracker.get_all_time_entries()
+        self._emit(self._cached_report('report_all_entries', self._report_all_entries_lines))
+    
+    def _report_all_entries_lines(self) -> List[str]:
+        """Build the lines of the all-entries report."""
+        # Entries by start time (most recent first)
+        entries = self.time_tracker.get_entries_by_start()
         if not entries:
-            print("No time entries found.")
-            return
-        
-        # Sort by start time (most recent first)
-        entries.sort(key=lambda e: e.start_time, reverse=True)
+            return ["No time entries found."]
         
-        total_time = 0
+        out = []
+        total_time = 0.0
+        get_task = self.task_manager.get_task_map().get
         for entry in entries:
-            task = self.task_manager.get_task(entry.task_id)
+            task = get_task(entry.task_id)
             task_title = task.title if task else "Unknown Task"
             
             duration = entry.get_duration_hours()
             total_time += duration
             
-            start_time = datetime.fromisoformat(entry.start_time)
             status = "⏱️ Active" if entry.end_time is None else "✅ Completed"
             
-            print(f"\n{status} - {task_title}")
-            print(f"   Duration: {duration:.2f}h")
-            print(f"   Date: {start_time.strftime('%Y-%m-%d %H:%M')}")
+            out.append(f"\n{status} - {task_title}")
+            out.append(f"   Duration: {duration:.2f}h")
+            out.append(f"   Date: {entry.start_label}")
             if entry.description:
-                print(f"   Description: {entry.description}")
+                out.append(f"   Description: {entry.description}")
         
-        print(f"\n📊 TOTAL TIME: {total_time:.2f} hours")
+        out.append(f"\n📊 TOTAL TIME: {total_time:.2f} hours")
+        return out
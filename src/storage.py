@@ -0,0 +1,341 @@
+"""
+Storage - JSON persistence helpers shared by the managers
+"""
+
+import json
+import mmap
+import os
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+# catch this regardless of which backend is in use.
+JSONDecodeError = json.JSONDecodeError
+
+# Compact once the change log holds this many ops per live record
+LOG_COMPACTION_RATIO = 4
+
+# Files larger than this are memory-mapped for orjson instead of read
+MMAP_THRESHOLD = 64 * 1024
+
+# Snapshots larger than this are stream-parsed when ijson is installed
+STREAM_THRESHOLD = 1024 * 1024
+
+# Set STRICT_FSYNC in the environment (to anything but 0/false/no/off) to
+# flush every write to disk
+STRICT_FSYNC = os.environ.get('STRICT_FSYNC', '').strip().lower() not in ('', '0', 'false', 'no', 'off')
+
+def loads(data: bytes) -> Any:
+    """Decode JSON from UTF-8 bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode('utf-8'))
+
+def dumps(obj: Any, indent: bool = True) -> bytes:
+    """Encode an object as UTF-8 JSON bytes, indented unless told otherwise."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def _read_json(f: BinaryIO) -> Any:
+    """Decode the JSON contents of an open binary file."""
+    if orjson is not None and os.fstat(f.fileno()).st_size > MMAP_THRESHOLD:
+        # orjson parses the mapped pages directly, skipping the read copy
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return orjson.loads(memoryview(mm))
+    return loads(f.read())
+
+def dump_records(path: str, records: Dict[str, Any]) -> None:
+    """Atomically replace a JSON file with a mapping, encoding one record at a time.
+    
+    The file is the mapping indented by two spaces, as dumps() would encode
+    it, but only one encoded record is held in memory at a time.
+    """
+    _write_atomic(path, _encode_records(records))
+
+def _encode_records(records: Dict[str, Any]) -> Iterator[bytes]:
+    """Yield the indented JSON encoding of a mapping piece by piece."""
+    if not records:
+        yield b'{}'
+        return
+    separator = b'{\n  '
+    for record_id, data in records.items():
+        # Nest each record's own indentation one level deeper
+        yield separator + dumps(record_id) + b': ' + dumps(data).replace(b'\n', b'\n  ')
+        separator = b',\n  '
+    yield b'\n}'
+
+def _write_atomic(path: str, chunks: Iterable[bytes]) -> None:
+    """Write chunks to a temporary file, then swap it in for path."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+        if STRICT_FSYNC:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if STRICT_FSYNC:
+        _fsync_dir(path)
+
+def _fsync_dir(path: str) -> None:
+    """Flush the directory entry of path, so a rename or new file survives power loss."""
+    if os.name == 'nt':
+        # Windows cannot open directories for fsync; NTFS journals the metadata
+        return
+    fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _set_aside(path: str) -> str:
+    """Rename a damaged file to an unused ``.corrupt`` name and return that name."""
+    target = path + '.corrupt'
+    suffix = 1
+    while os.path.exists(target):
+        target = f"{path}.corrupt{suffix}"
+        suffix += 1
+    os.replace(path, target)
+    return target
+
+class RecordStore:
+    """A JSON snapshot of records plus an append-only log of later changes.
+    
+    The snapshot at ``path`` maps record IDs to record dicts. Changes made
+    since the last compaction are appended to ``path + '.log'`` as one JSON
+    object per line, so saving a single change costs one small write
+    instead of a rewrite of the whole file.
+    """
+    
+    def __init__(self, path: str):
+        """Initialize the store for a snapshot path."""
+        self.path = path
+        self.log_path = path + '.log'
+        # Append handle, opened on the first write and flushed after each append
+        self._log_file: Optional[BinaryIO] = None
+        self.log_ops = 0
+        # Damaged files found by the last load
+        self.problems: List[str] = []
+    
+    def load(self, convert: Callable[[Dict[str, Any]], Any]) -> Dict[str, Any]:
+        """Read the snapshot and replay the change log over it.
+        
+        Each record dict is passed through ``convert`` as it is read, so
+        the raw dicts can be freed as soon as they have been converted.
+        A damaged snapshot or log is renamed aside rather than overwritten
+        later, and described in ``problems``.
+        """
+        self.problems = []
+        try:
+            records = self._load_snapshot(convert)
+        except FileNotFoundError:
+            records = {}
+        except (ValueError, KeyError, TypeError) as e:
+            # ValueError covers JSONDecodeError; the others come from convert
+            moved = _set_aside(self.path)
+            self.problems.append(f"{self.path} is damaged ({e}); moved it to {moved}")
+            records = {}
+        self.log_ops = 0
+        try:
+            f = open(self.log_path, 'rb')
+        except FileNotFoundError:
+            return records
+        # Byte offset just past the last line replayed
+        good_end = 0
+        newline_lost = False
+        damaged = None
+        with f:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        op = loads(line)
+                    except ValueError as e:
+                        # JSONDecodeError, or UnicodeDecodeError from a cut character
+                        if f.read().strip():
+                            # Bad data with changes after it is damage, not a torn write
+                            damaged = (line_number, getattr(e, 'msg', e))
+                            break
+                        # A torn final line from an interrupted write; cut it off
+                        # so the next append does not land on the partial line
+                        f.close()
+                        os.truncate(self.log_path, good_end)
+                        break
+                    try:
+                        if op['op'] == 'delete':
+                            records.pop(op['id'], None)
+                        else:
+                            records[op['id']] = convert(op['data'])
+                    except (ValueError, KeyError, TypeError) as e:
+                        damaged = (line_number, f"bad change {e!r}")
+                        break
+                    self.log_ops += 1
+                good_end += len(line)
+                newline_lost = not line.endswith(b'\n')
+        if damaged:
+            # Keep the changes replayed so far, and the rest of the log for inspection
+            self.close()
+            moved = _set_aside(self.log_path)
+            self.problems.append(
+                f"{self.log_path} line {damaged[0]} is damaged ({damaged[1]}); "
+                f"kept the changes before it and moved the log to {moved}"
+            )
+        elif newline_lost:
+            # The final change was written but its newline was not
+            with open(self.log_path, 'ab') as log:
+                log.write(b'\n')
+        return records
+    
+    def _load_snapshot(self, convert: Callable[[Dict[str, Any]], Any]) -> Dict[str, Any]:
+        """Read and convert the snapshot records, streaming large files."""
+        with open(self.path, 'rb') as f:
+            if ijson is not None and os.fstat(f.fileno()).st_size > STREAM_THRESHOLD:
+                try:
+                    return {
+                        record_id: convert(data)
+                        for record_id, data in ijson.kvitems(f, '', use_float=True)
+                    }
+                except ijson.JSONError as e:
+                    raise JSONDecodeError(str(e), '', 0) from e
+            data = _read_json(f)
+        return {record_id: convert(record) for record_id, record in data.items()}
+    
+    def append(self, changes: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        """Append record changes to the log; a value of None marks a deletion."""
+        lines = []
+        for record_id, data in changes.items():
+            if data is None:
+                op = {'op': 'delete', 'id': record_id}
+            else:
+                op = {'op': 'upsert', 'id': record_id, 'data': data}
+            lines.append(dumps(op, indent=False) + b'\n')
+        f = self._open_log()
+        # The buffered writer retries short writes, so flush() leaves whole lines
+        f.write(b''.join(lines))
+        f.flush()
+        if STRICT_FSYNC:
+            os.fsync(f.fileno())
+        self.log_ops += len(lines)
+    
+    def _open_log(self) -> BinaryIO:
+        """Get the log append handle, reopening it if the log was removed."""
+        f = self._log_file
+        if f is not None and os.fstat(f.fileno()).st_nlink == 0:
+            # Another store compacted the log away; writes must go to a new file
+            self.close()
+            f = None
+        if f is None:
+            f = self._log_file = open(self.log_path, 'ab')
+            if STRICT_FSYNC and f.tell() == 0:
+                # A new log's directory entry must reach the disk with its first line
+                _fsync_dir(self.log_path)
+        return f
+    
+    def close(self) -> None:
+        """Close the log append handle, if open."""
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+    
+    def __del__(self) -> None:
+        """Close the log handle when the store goes away."""
+        self.close()
+    
+    def needs_compaction(self, record_count: int) -> bool:
+        """Whether the log has grown large relative to the live record count."""
+        return self.log_ops > LOG_COMPACTION_RATIO * record_count
+    
+    def compact(self, records: Dict[str, Any]) -> None:
+        """Write a fresh snapshot and empty the change log."""
+        dump_records(self.path, records)
+        self.close()
+        try:
+            os.remove(self.log_path)
+        except FileNotFoundError:
+            pass
+        self.log_ops = 0
+
+class RecordManager:
+    """Base for managers whose records are persisted through a RecordStore.
+    
+    Subclasses keep their records in a dict of objects with ``to_dict()``
+    and call ``_mark_dirty`` after each change. Changes are saved at once,
+    or when the outermost ``with manager:`` batch ends.
+    """
+    
+    def __init__(self, data_file: str):
+        """Initialize the manager's store for a data file."""
+        self.data_file = data_file
+        self._store = RecordStore(data_file)
+        # IDs changed since the last save, in change order
+        self._pending: Dict[str, None] = {}
+        # Number of open `with` batches; changes are saved at once only outside one
+        self._batch_depth = 0
+        # Bumped on every load and change, so callers can cache derived data
+        self.revision = 0
+    
+    def _records(self) -> Dict[str, Any]:
+        """Get the live record ID -> record mapping."""
+        raise NotImplementedError
+    
+    def _load_records(self, convert: Callable[[Dict[str, Any]], Any], label: str) -> Dict[str, Any]:
+        """Load records from the store, reporting any damaged file it set aside."""
+        self.revision += 1
+        records = self._store.load(convert)
+        for problem in self._store.problems:
+            print(f"Error loading {label}: {problem}")
+        if self._store.log_ops:
+            # Fold changes from the previous session into the snapshot
+            os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
+            self._store.compact({record_id: record.to_dict() for record_id, record in records.items()})
+        return records
+    
+    def save(self) -> None:
+        """Append unsaved changes to the change log, compacting it when large."""
+        if not self._pending:
+            return
+        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
+        records = self._records()
+        changes = {}
+        for record_id in self._pending:
+            record = records.get(record_id)
+            changes[record_id] = record.to_dict() if record else None
+        self._store.append(changes)
+        self._pending = {}
+        if self._store.needs_compaction(len(records)):
+            self.compact()
+    
+    def compact(self) -> None:
+        """Rewrite the JSON snapshot and clear the change log."""
+        records = self._records()
+        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
+        self._store.compact({record_id: record.to_dict() for record_id, record in records.items()})
+    
+    def _mark_dirty(self, record_id: str) -> None:
+        """Record an unsaved change and save it unless batching."""
+        self.revision += 1
+        self._pending[record_id] = None
+        if not self._batch_depth:
+            self.save()
+    
+    def __enter__(self) -> 'RecordManager':
+        """Start a batch: defer saving until the outermost batch ends."""
+        self._batch_depth += 1
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """End a batch, saving all deferred changes once no batch is open."""
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self.save()
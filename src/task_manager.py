@@ -2,14 +2,19 @@
 Task Manager - Handle CRUD operations for tasks and projects
 """
 
-import json
-import os
+import sys
+from bisect import bisect_left, insort
+from collections import defaultdict
 from datetime import datetime
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
-from uuid import uuid4
+from typing import DefaultDict, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from secrets import token_hex
+import storage
 
-@dataclass
+# Task fields shared by many tasks; one interned copy is kept of each value
+_INTERNED_FIELDS = frozenset(('customer', 'project', 'status'))
+
+@dataclass(slots=True)
 class Task:
     """Task data model."""
     id: str
@@ -21,50 +26,91 @@ class Task:
     created_at: str
     updated_at: str
     estimated_hours: float = 0.0
+    # Serialized form, reused until a field changes
+    _cached_dict: Optional[Dict] = field(default=None, init=False, repr=False, compare=False)
+    
+    def __setattr__(self, name: str, value) -> None:
+        """Set an attribute, invalidating the cached dictionary."""
+        if name in _INTERNED_FIELDS and type(value) is str:
+            value = sys.intern(value)
+        object.__setattr__(self, name, value)
+        if name != '_cached_dict':
+            object.__setattr__(self, '_cached_dict', None)
     
     def to_dict(self) -> Dict:
-        """Convert task to dictionary."""
-        return asdict(self)
+        """Convert task to dictionary. The result is cached; do not modify it."""
+        data = self._cached_dict
+        if data is None:
+            data = {
+                'id': self.id,
+                'title': self.title,
+                'description': self.description,
+                'customer': self.customer,
+                'project': self.project,
+                'status': self.status,
+                'created_at': self.created_at,
+                'updated_at': self.updated_at,
+                'estimated_hours': self.estimated_hours,
+            }
+            object.__setattr__(self, '_cached_dict', data)
+        return data
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'Task':
         """Create task from dictionary."""
         return cls(**data)
 
-class TaskManager:
+class TaskManager(storage.RecordManager):
     """Manages CRUD operations for tasks and projects."""
     
+    # Fields that update_task may change
+    _UPDATABLE_FIELDS = frozenset(('title', 'description', 'customer', 'project', 'status', 'estimated_hours'))
+    
     def __init__(self, data_file: str = "data/tasks.json"):
         """Initialize task manager with data file."""
-        self.data_file = data_file
+        super().__init__(data_file)
         self.tasks: Dict[str, Task] = {}
-        self.load_tasks()
+        self._all_tasks: Optional[Tuple[Task, ...]] = None
+        # (created_at, task_id) pairs kept in ascending order
+        self._created_index: List[Tuple[str, str]] = []
+        # Secondary indexes: customer/project/status -> {task_id: task}
+        self._by_customer: DefaultDict[str, Dict[str, Task]] = defaultdict(dict)
+        self._by_project: DefaultDict[str, Dict[str, Task]] = defaultdict(dict)
+        self._by_status: DefaultDict[str, Dict[str, Task]] = defaultdict(dict)
+        # Tasks are read from disk on first use, not at startup
+        self._loaded = False
+    
+    def _ensure_loaded(self) -> None:
+        """Load tasks from disk if that has not happened yet."""
+        if not self._loaded:
+            self.load_tasks()
     
     def load_tasks(self) -> None:
-        """Load tasks from JSON file."""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.tasks = {
-                        task_id: Task.from_dict(task_data)
-                        for task_id, task_data in data.items()
-                    }
-            except (json.JSONDecodeError, KeyError) as e:
-                print(f"Error loading tasks: {e}")
-                self.tasks = {}
+        """Load tasks from the JSON snapshot and its change log."""
+        self._loaded = True
+        self.tasks = self._load_records(Task.from_dict, 'tasks')
+        self._created_index = sorted((task.created_at, task.id) for task in self.tasks.values())
+        self._by_customer = defaultdict(dict)
+        self._by_project = defaultdict(dict)
+        self._by_status = defaultdict(dict)
+        for task in self.tasks.values():
+            self._add_to_groups(task)
+        self._invalidate_views()
+    
+    def _records(self) -> Dict[str, Task]:
+        """Get the live task mapping, loading it first if needed."""
+        self._ensure_loaded()
+        return self.tasks
     
     def save_tasks(self) -> None:
-        """Save tasks to JSON file."""
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            data = {task_id: task.to_dict() for task_id, task in self.tasks.items()}
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        """Save unsaved task changes."""
+        self.save()
     
     def create_task(self, title: str, description: str, customer: str, 
                    project: str, estimated_hours: float = 0.0) -> Task:
         """Create a new task."""
-        task_id = str(uuid4())
+        self._ensure_loaded()
+        task_id = token_hex(8)
         now = datetime.now().isoformat()
         
         task = Task(
@@ -80,54 +126,133 @@ class TaskManager:
         )
         
         self.tasks[task_id] = task
-        self.save_tasks()
+        insort(self._created_index, (task.created_at, task_id))
+        self._add_to_groups(task)
+        self._invalidate_views()
+        self._mark_dirty(task_id)
         return task
     
     def get_task(self, task_id: str) -> Optional[Task]:
         """Get a task by ID."""
+        self._ensure_loaded()
         return self.tasks.get(task_id)
     
-    def get_all_tasks(self) -> List[Task]:
+    def get_task_map(self) -> Dict[str, Task]:
+        """Get the live task ID -> task mapping. It is shared and must not be modified."""
+        self._ensure_loaded()
+        return self.tasks
+    
+    def get_all_tasks(self) -> Tuple[Task, ...]:
         """Get all tasks."""
-        return list(self.tasks.values())
+        self._ensure_loaded()
+        if self._all_tasks is None:
+            self._all_tasks = tuple(self.tasks.values())
+        return self._all_tasks
+    
+    def get_tasks_by_created(self, offset: int = 0, limit: Optional[int] = None) -> List[Task]:
+        """Get tasks, most recently created first, optionally one page at a time."""
+        self._ensure_loaded()
+        end = max(len(self._created_index) - offset, 0)
+        start = 0 if limit is None else max(end - limit, 0)
+        return [self.tasks[task_id] for _, task_id in reversed(self._created_index[start:end])]
+    
+    def count_tasks(self) -> int:
+        """Get the number of tasks."""
+        self._ensure_loaded()
+        return len(self.tasks)
     
     def get_tasks_by_customer(self, customer: str) -> List[Task]:
         """Get all tasks for a specific customer."""
-        return [task for task in self.tasks.values() if task.customer == customer]
+        self._ensure_loaded()
+        return list(self._by_customer.get(customer, {}).values())
     
     def get_tasks_by_project(self, project: str) -> List[Task]:
         """Get all tasks for a specific project."""
-        return [task for task in self.tasks.values() if task.project == project]
+        self._ensure_loaded()
+        return list(self._by_project.get(project, {}).values())
+    
+    def get_tasks_by_status(self, status: str) -> List[Task]:
+        """Get all tasks with a specific status."""
+        self._ensure_loaded()
+        return list(self._by_status.get(status, {}).values())
+    
+    def grouped_views(self) -> Tuple[Dict[str, Dict[str, Task]], Dict[str, Dict[str, Task]]]:
+        """Get tasks grouped by customer and by project.
+        
+        Both mappings are the live secondary indexes, keyed by name and then
+        by task ID. They are shared and must not be modified.
+        """
+        self._ensure_loaded()
+        return self._by_customer, self._by_project
     
     def update_task(self, task_id: str, **kwargs) -> Optional[Task]:
         """Update a task."""
+        self._ensure_loaded()
         if task_id not in self.tasks:
             return None
         
         task = self.tasks[task_id]
         
-        # Update allowed fields
-        allowed_fields = ['title', 'description', 'customer', 'project', 'status', 'estimated_hours']
-        for field, value in kwargs.items():
-            if field in allowed_fields and hasattr(task, field):
-                setattr(task, field, value)
+        # Keep allowed fields whose value actually changes
+        changes = {
+            field: value for field, value in kwargs.items()
+            if field in self._UPDATABLE_FIELDS and getattr(task, field) != value
+        }
+        if not changes:
+            return task
+        
+        regroup = 'customer' in changes or 'project' in changes or 'status' in changes
+        if regroup:
+            self._remove_from_groups(task)
+        for field, value in changes.items():
+            setattr(task, field, value)
         
+        if regroup:
+            self._add_to_groups(task)
         task.updated_at = datetime.now().isoformat()
-        self.save_tasks()
+        self._mark_dirty(task_id)
         return task
     
     def delete_task(self, task_id: str) -> bool:
         """Delete a task."""
+        self._ensure_loaded()
         if task_id in self.tasks:
-            del self.tasks[task_id]
-            self.save_tasks()
+            task = self.tasks.pop(task_id)
+            del self._created_index[bisect_left(self._created_index, (task.created_at, task_id))]
+            self._remove_from_groups(task)
+            self._invalidate_views()
+            self._mark_dirty(task_id)
             return True
         return False
     
+    def _add_to_groups(self, task: Task) -> None:
+        """Add a task to the customer, project and status indexes."""
+        self._by_customer[task.customer][task.id] = task
+        self._by_project[task.project][task.id] = task
+        self._by_status[task.status][task.id] = task
+    
+    def _remove_from_groups(self, task: Task) -> None:
+        """Remove a task from the customer, project and status indexes."""
+        for index, key in (
+            (self._by_customer, task.customer),
+            (self._by_project, task.project),
+            (self._by_status, task.status),
+        ):
+            group = index[key]
+            del group[task.id]
+            if not group:
+                del index[key]
+    
+    def _invalidate_views(self) -> None:
+        """Drop cached views after the task set changes."""
+        self._all_tasks = None
+    
     def get_customers(self) -> List[str]:
         """Get list of unique customers."""
-        return list(set(task.customer for task in self.tasks.values()))
+        self._ensure_loaded()
+        return list(self._by_customer)
     
     def get_projects(self) -> List[str]:
         """Get list of unique projects."""
-        return list(set(task.project for task in self.tasks.values()))
+        self._ensure_loaded()
+        return list(self._by_project)
@@ -2,14 +2,20 @@
 Time Tracker - Handle time tracking for tasks
 """
 
-import json
-import os
+import re
+import sys
+from bisect import bisect_left, insort
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
-from uuid import uuid4
+from typing import DefaultDict, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from secrets import token_hex
+import storage
 
-@dataclass
+# Date and minute fields of an ISO timestamp, as stored by start_timer
+_ISO_MINUTE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2})')
+
+@dataclass(slots=True)
 class TimeEntry:
     """Time entry data model."""
     id: str
@@ -18,10 +24,68 @@ class TimeEntry:
     end_time: Optional[str]
     description: str
     duration_seconds: int = 0
+    # Serialized form, reused until a field changes
+    _cached_dict: Optional[Dict] = field(default=None, init=False, repr=False, compare=False)
+    # Parsed start_time/end_time, filled in on first use
+    _start_dt: Optional[datetime] = field(default=None, init=False, repr=False, compare=False)
+    _end_dt: Optional[datetime] = field(default=None, init=False, repr=False, compare=False)
+    # start_time formatted for display, filled in on first use
+    _start_label: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    
+    def __setattr__(self, name: str, value) -> None:
+        """Set an attribute, invalidating the caches derived from it."""
+        if name == 'task_id' and type(value) is str:
+            # Many entries share a task ID; keep one copy of each
+            value = sys.intern(value)
+        object.__setattr__(self, name, value)
+        if not name.startswith('_'):
+            object.__setattr__(self, '_cached_dict', None)
+            if name == 'start_time':
+                object.__setattr__(self, '_start_dt', None)
+                object.__setattr__(self, '_start_label', None)
+            elif name == 'end_time':
+                object.__setattr__(self, '_end_dt', None)
+    
+    @property
+    def start_dt(self) -> datetime:
+        """Start time as a datetime, parsed once."""
+        if self._start_dt is None:
+            object.__setattr__(self, '_start_dt', datetime.fromisoformat(self.start_time))
+        return self._start_dt
+    
+    @property
+    def end_dt(self) -> Optional[datetime]:
+        """End time as a datetime, parsed once; None while the timer runs."""
+        if self._end_dt is None and self.end_time is not None:
+            object.__setattr__(self, '_end_dt', datetime.fromisoformat(self.end_time))
+        return self._end_dt
+    
+    @property
+    def start_label(self) -> str:
+        """Start time formatted as 'YYYY-MM-DD HH:MM', formatted once."""
+        if self._start_label is None:
+            match = _ISO_MINUTE_RE.match(self.start_time)
+            if match:
+                label = f"{match.group(1)} {match.group(2)}"
+            else:
+                label = self.start_dt.strftime('%Y-%m-%d %H:%M')
+            object.__setattr__(self, '_start_label', label)
+        return self._start_label
     
     def to_dict(self) -> Dict:
-        """Convert time entry to dictionary."""
-        return asdict(self)
+        """Convert time entry to dictionary. The result is cached; do not modify it."""
+        data = self._cached_dict
+        if data is None:
+            data = {
+                'id': self.id,
+                'task_id': self.task_id,
+                'start_time': self.start_time,
+                'end_time': self.end_time,
+                'description': self.description,
+                'duration_seconds': self.duration_seconds,
+            }
+            object.__setattr__(self, '_cached_dict', data)
+        return data
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'TimeEntry':
@@ -32,52 +96,80 @@ class TimeEntry:
         """Get duration in hours."""
         return self.duration_seconds / 3600.0
 
-class TimeTracker:
+class TimeTracker(storage.RecordManager):
     """Manages time tracking for tasks."""
     
+    # Fields that update_time_entry may change
+    _UPDATABLE_FIELDS = frozenset(('description', 'start_time', 'end_time'))
+    
     def __init__(self, data_file: str = "data/time_entries.json"):
         """Initialize time tracker with data file."""
-        self.data_file = data_file
+        super().__init__(data_file)
         self.time_entries: Dict[str, TimeEntry] = {}
         self.active_entry: Optional[TimeEntry] = None
+        # (start_time, entry_id) pairs kept in ascending order
+        self._start_index: List[Tuple[str, str]] = []
+        # Recorded seconds per task, excluding the running timer
+        self._seconds_by_task: Dict[str, int] = {}
+        # Secondary index: task_id -> {entry_id: entry}
+        self._by_task: DefaultDict[str, Dict[str, TimeEntry]] = defaultdict(dict)
         self.load_time_entries()
     
     def load_time_entries(self) -> None:
-        """Load time entries from JSON file."""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.time_entries = {
-                        entry_id: TimeEntry.from_dict(entry_data)
-                        for entry_id, entry_data in data.items()
-                    }
-                    
-                    # Check for active entry (end_time is None)
-                    for entry in self.time_entries.values():
-                        if entry.end_time is None:
-                            self.active_entry = entry
-                            break
-                            
-            except (json.JSONDecodeError, KeyError) as e:
-                print(f"Error loading time entries: {e}")
-                self.time_entries = {}
+        """Load time entries from the JSON snapshot and its change log."""
+        self.time_entries = self._load_records(TimeEntry.from_dict, 'time entries')
+        
+        # Check for active entry (end_time is None)
+        for entry in self.time_entries.values():
+            if entry.end_time is None:
+                self.active_entry = entry
+                break
+        self._start_index = sorted(
+            (entry.start_time, entry.id) for entry in self.time_entries.values()
+        )
+        self._seconds_by_task = {}
+        self._by_task = defaultdict(dict)
+        for entry in self.time_entries.values():
+            self._add_seconds(entry.task_id, entry.duration_seconds)
+            self._by_task[entry.task_id][entry.id] = entry
+    
+    def _records(self) -> Dict[str, TimeEntry]:
+        """Get the live time entry mapping."""
+        return self.time_entries
     
     def save_time_entries(self) -> None:
-        """Save time entries to JSON file."""
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            data = {entry_id: entry.to_dict() for entry_id, entry in self.time_entries.items()}
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        """Save unsaved time entry changes."""
+        self.save()
     
     def start_timer(self, task_id: str, description: str = "") -> TimeEntry:
         """Start tracking time for a task."""
         if self.active_entry:
             # Stop current timer first
-            self.stop_timer()
+            return self.switch_timer(task_id, description)
+        return self._start_at(task_id, description, datetime.now())
+    
+    def switch_timer(self, task_id: str, description: str = "") -> TimeEntry:
+        """Stop the active timer and start a new one, saving both changes at once.
         
-        entry_id = str(uuid4())
-        start_time = datetime.now().isoformat()
+        The clock is read once, so the new entry starts exactly when the old one ends.
+        """
+        now = datetime.now()
+        with self:
+            if self.active_entry:
+                self._stop_at(now)
+            time_entry = self._start_at(task_id, description, now)
+        return time_entry
+    
+    def stop_timer(self) -> Optional[TimeEntry]:
+        """Stop the currently active timer."""
+        if not self.active_entry:
+            return None
+        return self._stop_at(datetime.now())
+    
+    def _start_at(self, task_id: str, description: str, now: datetime) -> TimeEntry:
+        """Start a new entry at the given time; no timer may be active."""
+        entry_id = token_hex(8)
+        start_time = now.isoformat()
         
         time_entry = TimeEntry(
             id=entry_id,
@@ -89,25 +181,23 @@ class TimeTracker:
         )
         
         self.time_entries[entry_id] = time_entry
+        insort(self._start_index, (start_time, entry_id))
+        self._by_task[task_id][entry_id] = time_entry
         self.active_entry = time_entry
-        self.save_time_entries()
+        self._mark_dirty(entry_id)
         return time_entry
     
-    def stop_timer(self) -> Optional[TimeEntry]:
-        """Stop the currently active timer."""
-        if not self.active_entry:
-            return None
-        
-        end_time = datetime.now()
-        start_time = datetime.fromisoformat(self.active_entry.start_time)
-        duration = end_time - start_time
+    def _stop_at(self, end_time: datetime) -> TimeEntry:
+        """Stop the active entry at the given time."""
+        duration = end_time - self.active_entry.start_dt
         
         self.active_entry.end_time = end_time.isoformat()
         self.active_entry.duration_seconds = int(duration.total_seconds())
         
         completed_entry = self.active_entry
+        self._add_seconds(completed_entry.task_id, completed_entry.duration_seconds)
         self.active_entry = None
-        self.save_time_entries()
+        self._mark_dirty(completed_entry.id)
         return completed_entry
     
     def get_active_entry(self) -> Optional[TimeEntry]:
@@ -116,25 +206,36 @@ class TimeTracker:
     
     def get_time_entries_for_task(self, task_id: str) -> List[TimeEntry]:
         """Get all time entries for a specific task."""
-        return [entry for entry in self.time_entries.values() if entry.task_id == task_id]
+        return list(self._by_task.get(task_id, {}).values())
     
     def get_all_time_entries(self) -> List[TimeEntry]:
         """Get all time entries."""
         return list(self.time_entries.values())
     
+    def get_entries_by_start(self) -> List[TimeEntry]:
+        """Get all time entries, most recently started first."""
+        return [self.time_entries[entry_id] for _, entry_id in reversed(self._start_index)]
+    
     def get_total_time_for_task(self, task_id: str) -> float:
         """Get total time spent on a task in hours."""
-        entries = self.get_time_entries_for_task(task_id)
-        total_seconds = sum(entry.duration_seconds for entry in entries)
+        total_seconds = self._seconds_by_task.get(task_id, 0)
         
         # Add time from active entry if it's for this task
         if self.active_entry and self.active_entry.task_id == task_id:
-            start_time = datetime.fromisoformat(self.active_entry.start_time)
-            current_duration = datetime.now() - start_time
+            current_duration = datetime.now() - self.active_entry.start_dt
             total_seconds += int(current_duration.total_seconds())
         
         return total_seconds / 3600.0
     
+    def get_totals_by_task(self) -> Dict[str, float]:
+        """Get total hours per task, including the running timer."""
+        totals = dict(self._seconds_by_task)
+        if self.active_entry:
+            current_duration = datetime.now() - self.active_entry.start_dt
+            task_id = self.active_entry.task_id
+            totals[task_id] = totals.get(task_id, 0) + int(current_duration.total_seconds())
+        return {task_id: seconds / 3600.0 for task_id, seconds in totals.items()}
+    
     def delete_time_entry(self, entry_id: str) -> bool:
         """Delete a time entry."""
         if entry_id in self.time_entries:
@@ -142,7 +243,10 @@ class TimeTracker:
             if entry == self.active_entry:
                 self.active_entry = None
             del self.time_entries[entry_id]
-            self.save_time_entries()
+            self._remove_from_start_index(entry)
+            self._remove_from_task_index(entry)
+            self._add_seconds(entry.task_id, -entry.duration_seconds)
+            self._mark_dirty(entry_id)
             return True
         return False
     
@@ -153,18 +257,40 @@ class TimeTracker:
         
         entry = self.time_entries[entry_id]
         
-        # Update allowed fields
-        allowed_fields = ['description', 'start_time', 'end_time']
-        for field, value in kwargs.items():
-            if field in allowed_fields and hasattr(entry, field):
-                setattr(entry, field, value)
+        # Keep allowed fields whose value actually changes
+        changes = {
+            field: value for field, value in kwargs.items()
+            if field in self._UPDATABLE_FIELDS and getattr(entry, field) != value
+        }
+        if not changes:
+            return entry
+        
+        self._remove_from_start_index(entry)
+        for field, value in changes.items():
+            setattr(entry, field, value)
+        insort(self._start_index, (entry.start_time, entry_id))
         
         # Recalculate duration if times changed
-        if 'start_time' in kwargs or 'end_time' in kwargs:
+        if 'start_time' in changes or 'end_time' in changes:
             if entry.end_time:
-                start = datetime.fromisoformat(entry.start_time)
-                end = datetime.fromisoformat(entry.end_time)
-                entry.duration_seconds = int((end - start).total_seconds())
+                old_seconds = entry.duration_seconds
+                entry.duration_seconds = int((entry.end_dt - entry.start_dt).total_seconds())
+                self._add_seconds(entry.task_id, entry.duration_seconds - old_seconds)
         
-        self.save_time_entries()
+        self._mark_dirty(entry_id)
         return entry
+    
+    def _add_seconds(self, task_id: str, seconds: int) -> None:
+        """Adjust the recorded time total for a task."""
+        self._seconds_by_task[task_id] = self._seconds_by_task.get(task_id, 0) + seconds
+    
+    def _remove_from_task_index(self, entry: TimeEntry) -> None:
+        """Remove an entry from the per-task index."""
+        group = self._by_task[entry.task_id]
+        del group[entry.id]
+        if not group:
+            del self._by_task[entry.task_id]
+    
+    def _remove_from_start_index(self, entry: TimeEntry) -> None:
+        """Remove an entry from the start-time index."""
+        del self._start_index[bisect_left(self._start_index, (entry.start_time, entry.id))]
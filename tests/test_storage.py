@@ -0,0 +1,187 @@
+"""
+Tests for the snapshot + change log persistence layer
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+
+import storage
+from task_manager import TaskManager
+
+def upsert(record_id: str, **data) -> bytes:
+    """Encode one upsert log line."""
+    return json.dumps({'op': 'upsert', 'id': record_id, 'data': data}).encode('utf-8') + b'\n'
+
+def delete(record_id: str) -> bytes:
+    """Encode one delete log line."""
+    return json.dumps({'op': 'delete', 'id': record_id}).encode('utf-8') + b'\n'
+
+class RecordStoreTest(unittest.TestCase):
+    """RecordStore log replay, repair and compaction."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'records.json')
+        self.store = storage.RecordStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    def write(self, path: str, data: bytes) -> None:
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def read(self, path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def load(self):
+        return storage.RecordStore(self.path).load(dict)
+
+    def test_replays_log_over_snapshot(self):
+        self.write(self.path, json.dumps({'a': {'n': 1}, 'b': {'n': 2}}).encode('utf-8'))
+        self.write(self.store.log_path, upsert('a', n=10) + delete('b') + upsert('c', n=3))
+        records = self.store.load(dict)
+        self.assertEqual(records, {'a': {'n': 10}, 'c': {'n': 3}})
+        self.assertEqual(self.store.log_ops, 3)
+        self.assertEqual(self.store.problems, [])
+
+    def test_append_round_trips(self):
+        self.store.append({'a': {'n': 1}, 'b': {'n': 2}})
+        self.store.append({'a': None})
+        self.assertEqual(self.load(), {'b': {'n': 2}})
+
+    def test_torn_tail_is_truncated(self):
+        good = upsert('a', n=1)
+        self.write(self.store.log_path, good + b'{"op":"upsert","id":"b","da')
+        self.assertEqual(self.store.load(dict), {'a': {'n': 1}})
+        self.assertEqual(self.read(self.store.log_path), good)
+        self.store.append({'c': {'n': 3}})
+        self.assertEqual(self.load(), {'a': {'n': 1}, 'c': {'n': 3}})
+
+    def test_torn_only_line_is_truncated(self):
+        self.write(self.store.log_path, b'{"op":"upsert","id":"a"')
+        self.assertEqual(self.store.load(dict), {})
+        self.store.append({'b': {'n': 2}})
+        self.store.append({'c': {'n': 3}})
+        self.assertEqual(self.load(), {'b': {'n': 2}, 'c': {'n': 3}})
+
+    def test_torn_multibyte_character_is_truncated(self):
+        good = upsert('a', n=1)
+        cut = '{"op":"upsert","id":"b","data":{"t":"é'.encode('utf-8')[:-1]
+        self.write(self.store.log_path, good + cut)
+        self.assertEqual(self.store.load(dict), {'a': {'n': 1}})
+        self.assertEqual(self.read(self.store.log_path), good)
+
+    def test_lost_newline_is_restored(self):
+        self.write(self.store.log_path, upsert('a', n=1).rstrip(b'\n'))
+        self.assertEqual(self.store.load(dict), {'a': {'n': 1}})
+        self.store.append({'b': {'n': 2}})
+        self.assertEqual(self.load(), {'a': {'n': 1}, 'b': {'n': 2}})
+
+    def test_damaged_middle_line_sets_log_aside(self):
+        self.write(self.path, json.dumps({'a': {'n': 1}}).encode('utf-8'))
+        log = upsert('b', n=2) + b'garbage\n' + upsert('c', n=3)
+        self.write(self.store.log_path, log)
+        records = self.store.load(dict)
+        self.assertEqual(records, {'a': {'n': 1}, 'b': {'n': 2}})
+        self.assertEqual(len(self.store.problems), 1)
+        self.assertIn('line 2', self.store.problems[0])
+        self.assertFalse(os.path.exists(self.store.log_path))
+        self.assertEqual(self.read(self.store.log_path + '.corrupt'), log)
+
+    def test_set_aside_keeps_earlier_copies(self):
+        for _ in range(2):
+            self.write(self.store.log_path, b'garbage\n' + upsert('a', n=1))
+            self.store.load(dict)
+        self.assertTrue(os.path.exists(self.store.log_path + '.corrupt'))
+        self.assertTrue(os.path.exists(self.store.log_path + '.corrupt1'))
+
+    def test_damaged_snapshot_sets_it_aside_and_replays_log(self):
+        self.write(self.path, b'{"a": ')
+        self.write(self.store.log_path, upsert('b', n=2))
+        self.assertEqual(self.store.load(dict), {'b': {'n': 2}})
+        self.assertEqual(len(self.store.problems), 1)
+        self.assertEqual(self.read(self.path + '.corrupt'), b'{"a": ')
+
+    def test_compaction(self):
+        self.store.append({'a': {'n': 1}})
+        self.store.append({'a': {'n': 2}})
+        self.assertFalse(self.store.needs_compaction(1))
+        self.store.append({'a': {'n': 3}, 'b': {'n': 4}, 'c': {'n': 5}})
+        self.assertTrue(self.store.needs_compaction(1))
+        self.store.compact({'a': {'n': 3}})
+        self.assertEqual(self.store.log_ops, 0)
+        self.assertFalse(os.path.exists(self.store.log_path))
+        self.assertEqual(json.loads(self.read(self.path)), {'a': {'n': 3}})
+        self.store.append({'b': {'n': 4}})
+        self.assertEqual(self.load(), {'a': {'n': 3}, 'b': {'n': 4}})
+
+    def test_compacted_snapshot_matches_indented_dump(self):
+        records = {'a': {'n': 1, 'tags': ['x', 'y']}, 'b': {'n': 2}}
+        self.store.compact(records)
+        self.assertEqual(self.read(self.path), storage.dumps(records))
+
+class TaskManagerPersistenceTest(unittest.TestCase):
+    """TaskManager saving, batching and recovery through its store."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'data', 'tasks.json')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def manager(self) -> TaskManager:
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager = TaskManager(self.path)
+            manager.count_tasks()
+        return manager
+
+    def test_load_folds_log_into_snapshot(self):
+        manager = self.manager()
+        manager.create_task('a', '', 'C', 'P')
+        self.assertTrue(os.path.exists(self.path + '.log'))
+        reloaded = self.manager()
+        self.assertEqual(reloaded.count_tasks(), 1)
+        self.assertFalse(os.path.exists(self.path + '.log'))
+
+    def test_damaged_log_line_keeps_snapshot(self):
+        manager = self.manager()
+        for i in range(5):
+            manager.create_task(f'snap {i}', '', 'C', 'P')
+        manager.compact()
+        for i in range(10):
+            manager.create_task(f'log {i}', '', 'C', 'P')
+        manager._store.close()
+        with open(self.path + '.log', 'rb') as f:
+            lines = f.readlines()
+        lines.insert(5, b'garbage\n')
+        with open(self.path + '.log', 'wb') as f:
+            f.writelines(lines)
+
+        recovered = self.manager()
+        self.assertEqual(recovered.count_tasks(), 10)
+        recovered.create_task('new', '', 'C', 'P')
+        self.assertEqual(self.manager().count_tasks(), 11)
+        self.assertTrue(os.path.exists(self.path + '.log.corrupt'))
+
+    def test_nested_batches_save_at_outermost_exit(self):
+        manager = self.manager()
+        with manager:
+            with manager:
+                manager.create_task('a', '', 'C', 'P')
+            self.assertFalse(os.path.exists(self.path + '.log'))
+            manager.create_task('b', '', 'C', 'P')
+        self.assertEqual(self.manager().count_tasks(), 2)
+
+if __name__ == '__main__':
+    unittest.main()